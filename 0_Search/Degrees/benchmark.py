@@ -0,0 +1,206 @@
+"""
+Benchmark for Degrees search strategies.
+
+Generates a synthetic scale-free co-star graph, runs a fixed set of
+queries with each search strategy and frontier implementation, and
+prints the number of people expanded, peak frontier size, wall time and
+peak memory for each as JSON.
+
+Usage: python benchmark.py [--people N] [--movies N] [--cast N]
+                           [--queries N] [--seed N] [--output FILE]
+                           [--strategies NAME ...]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+from graph import CompactGraph
+from landmarks import LandmarkIndex
+from util import QueueFrontier, DequeQueueFrontier
+
+
+def generate(directory, people_count, movies_count, cast_size, seed):
+    """
+    Writes people.csv, movies.csv and stars.csv for a synthetic graph
+    to directory. Each movie's cast is drawn by preferential attachment,
+    so a few people star in many movies, as in the IMDb data.
+    """
+    rng = random.Random(seed)
+
+    with open(f"{directory}/people.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people_count):
+            writer.writerow([i, f"Person {i}", 1900 + rng.randrange(100)])
+
+    with open(f"{directory}/movies.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies_count):
+            writer.writerow([i, f"Movie {i}", 1920 + rng.randrange(100)])
+
+    # Each person appears in this list once, plus once per movie so far
+    weighted = list(range(people_count))
+    with open(f"{directory}/stars.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movies_count):
+            cast = set()
+            while len(cast) < min(cast_size, people_count):
+                cast.add(rng.choice(weighted))
+            for person in cast:
+                writer.writerow([person, movie])
+                weighted.append(person)
+
+
+def bfs_list(source, target, stats):
+    return degrees.shortest_path(source, target, QueueFrontier, stats)
+
+
+def bfs_deque(source, target, stats):
+    return degrees.shortest_path(source, target, DequeQueueFrontier, stats)
+
+
+def landmarks(source, target, stats):
+    return degrees.landmark_index.shortest_path(
+        source, target, degrees.neighbors_for_person, stats
+    )
+
+
+def compact(source, target, stats):
+    return degrees.graph.shortest_path(source, target, stats)
+
+
+# Maps strategy names to the graph representation they need
+# and a search function of (source, target, stats)
+STRATEGIES = {
+    "bfs-list": ("dictionaries", bfs_list),
+    "bfs-deque": ("dictionaries", bfs_deque),
+    "bidirectional": ("dictionaries", degrees.bidirectional_shortest_path),
+    "movie-projection": ("dictionaries", degrees.movie_projection_path),
+    "landmarks": ("landmarks", landmarks),
+    "compact": ("compact", compact),
+}
+
+
+def prepare(representation, directory):
+    """
+    Loads the graph representation a strategy needs.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.landmark_index = None
+    if representation == "compact":
+        degrees.graph = CompactGraph.from_csv(directory)
+        return
+    degrees.load_data(directory, cache=False)
+    if representation == "landmarks":
+        degrees.landmark_index = LandmarkIndex.build(
+            list(degrees.people), degrees.neighbors_for_person
+        )
+
+
+def run(search, queries):
+    """
+    Runs every query with a search function, returning a dictionary of
+    measurements over the whole query set.
+    """
+    explored = 0
+    frontier_peak = 0
+    total_degrees = 0
+    connected = 0
+
+    # Time the queries without tracing, then measure memory separately
+    start = time.perf_counter()
+    for source, target in queries:
+        stats = {}
+        path = search(source, target, stats)
+        explored += stats.get("explored", 0)
+        frontier_peak = max(frontier_peak, stats.get("frontier_peak", 0))
+        if path is not None:
+            connected += 1
+            total_degrees += len(path)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    for source, target in queries:
+        search(source, target, {})
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "queries": len(queries),
+        "connected": connected,
+        "total_degrees": total_degrees,
+        "explored": explored,
+        "frontier_peak": frontier_peak,
+        "seconds": round(seconds, 6),
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--people", type=int, default=5000)
+    parser.add_argument("--movies", type=int, default=2500)
+    parser.add_argument("--cast", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--strategies", nargs="+",
+                        help="strategies to run (default: all)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, args.people, args.movies, args.cast, args.seed)
+
+        rng = random.Random(args.seed)
+        queries = [(str(rng.randrange(args.people)),
+                    str(rng.randrange(args.people)))
+                   for _ in range(args.queries)]
+
+        names = args.strategies or list(STRATEGIES)
+        for name in names:
+            if name not in STRATEGIES:
+                sys.exit(f"Unknown strategy: {name}")
+
+        results = []
+        for name in names:
+            representation, search = STRATEGIES[name]
+            prepare(representation, directory)
+            result = {"strategy": name}
+            result.update(run(search, queries))
+            results.append(result)
+
+    report = {
+        "config": {
+            "people": args.people,
+            "movies": args.movies,
+            "cast": args.cast,
+            "queries": args.queries,
+            "seed": args.seed,
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
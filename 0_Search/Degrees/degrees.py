@@ -1,7 +1,13 @@
+import argparse
 import csv
+import multiprocessing
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import CompactGraph
+from landmarks import LandmarkIndex
+from nameindex import NameIndex
+from snapshot import read_snapshot, snapshot_path, source_key, write_snapshot
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,54 +18,232 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact CSR graph, used instead of the dictionaries above when loaded
+graph = None
 
-def load_data(directory):
+# Landmark index, whose connected component ids answer unconnected
+# pairs without searching when loaded
+landmark_index = None
+
+# Whether find_path searches the person-movie graph with
+# movie_projection_path instead of bidirectional search
+movie_projection = False
+
+# Name lookup index, built on the first candidates_for_name call
+name_index = None
+
+# Key identifying the files and options the loaded data came from
+data_key = None
+
+# File name of the dictionary snapshots within a data directory,
+# before the digest of the load options is added
+SNAPSHOT = "degrees.snapshot"
+
+
+def load_data(directory, compact=False, cache=True,
+              min_year=None, max_year=None, min_cast=None):
     """
     Load data from CSV files into memory.
+    If compact is True, load a CompactGraph instead of the dictionaries.
+    If cache is True, load from a snapshot of a previous parse when the
+    CSV files are unchanged, and write one otherwise.
+    min_year, max_year and min_cast restrict the data to a subgraph
+    (see parse_csv).
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    global data_key, name_index
+    name_index = None
+    if compact:
+        if (min_year is not None or max_year is not None
+                or min_cast is not None):
+            raise ValueError("filters are not supported for compact graphs")
+        global graph
+        graph = CompactGraph.from_directory(directory, cache=cache)
+        data_key = source_key(directory)
+        return
+
+    key = data_key = source_key(directory, min_year, max_year, min_cast)
+    path = snapshot_path(directory, SNAPSHOT, key)
+    if cache:
+        snapshot = read_snapshot(path, key)
+        if snapshot is not None:
+            (cached_names, cached_people, cached_movies), _ = snapshot
+            names.update(cached_names)
+            people.update(cached_people)
+            movies.update(cached_movies)
+            return
+
+    parse_csv(directory, min_year, max_year, min_cast)
+
+    if cache:
+        try:
+            write_snapshot(path, key, (names, people, movies))
+        except OSError:
+            pass
+
+
+def load_landmarks(directory, count=0):
+    """
+    Load the landmark index saved next to the data in directory,
+    building and saving it first if it is missing or out of date.
+    Queries only use its connected component ids, so by default no
+    landmark distances are computed.
+    """
+    global landmark_index
+    person_ids = graph.person_ids if graph is not None else list(people)
+    landmark_index = LandmarkIndex.from_directory(
+        directory, data_key, person_ids,
+        neighbors_for_person, count
+    )
+
+
+def parse_csv(directory, min_year=None, max_year=None, min_cast=None):
+    """
+    Parse the CSV files in a directory into names, people and movies,
+    reading each file once, row by row.
+    Only movies released between min_year and max_year (inclusive) with
+    at least min_cast known stars are kept. When any filter is given,
+    people who starred in none of the kept movies are left out as well.
+    """
+    filtered = (min_year is not None or max_year is not None
+                or min_cast is not None)
+
+    # Load movies, keeping those in the year range
+    with open(f"{directory}/movies.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_, title, year = (header.index(column)
+                            for column in ("id", "title", "year"))
         for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
+            if not row:
+                continue
+            if min_year is not None or max_year is not None:
+                try:
+                    released = int(row[year])
+                except ValueError:
+                    continue
+                if min_year is not None and released < min_year:
+                    continue
+                if max_year is not None and released > max_year:
+                    continue
+            movies[sys.intern(row[id_])] = {
+                "title": row[title],
+                "year": row[year],
                 "stars": set()
             }
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    # Load stars for the kept movies
+    with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        person_id, movie_id = (header.index(column)
+                               for column in ("person_id", "movie_id"))
         for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+            if not row:
+                continue
+            movie = movies.get(row[movie_id])
+            if movie is not None:
+                movie["stars"].add(sys.intern(row[person_id]))
+
+    # Load people, keeping everyone unless filtering
+    with open(f"{directory}/people.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_, name, birth = (header.index(column)
+                            for column in ("id", "name", "birth"))
+        if filtered:
+            cast = set()
+            for movie in movies.values():
+                cast.update(movie["stars"])
+        for row in reader:
+            if not row:
+                continue
+            if filtered and row[id_] not in cast:
+                continue
+            people[sys.intern(row[id_])] = {
+                "name": row[name],
+                "birth": row[birth],
+                "movies": set()
+            }
+
+    # Link people and movies, dropping stars who are not known people
+    # and movies whose cast is too small
+    for movie_id, movie in list(movies.items()):
+        stars = movie["stars"]
+        stars.difference_update([person_id for person_id in stars
+                                 if person_id not in people])
+        if min_cast is not None and len(stars) < min_cast:
+            del movies[movie_id]
+            continue
+        for person_id in stars:
+            people[person_id]["movies"].add(movie_id)
+
+    if filtered:
+        for person_id in [person_id for person_id, person in people.items()
+                          if not person["movies"]]:
+            del people[person_id]
+
+    for person_id, person in people.items():
+        key = sys.intern(person["name"].lower())
+        names.setdefault(key, set()).add(person_id)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [--compact] [--no-cache] "
+              "[--min-year Y] [--max-year Y] [--min-cast N] [--components] "
+              "[--movie-projection] "
+              "[--batch FILE [--processes N]] [directory]"
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the graph in compact CSR arrays")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="do not read or write a snapshot of the data")
+    parser.add_argument("--min-year", type=int,
+                        help="only load movies released in or after this year")
+    parser.add_argument("--max-year", type=int,
+                        help="only load movies released in or before this year")
+    parser.add_argument("--min-cast", type=int,
+                        help="only load movies with at least this many stars")
+    parser.add_argument("--components", action="store_true",
+                        help="answer unconnected pairs from an index of "
+                             "connected components without searching")
+    parser.add_argument("--movie-projection", action="store_true",
+                        help="search the person-movie graph, scanning each "
+                             "movie's cast once (not with --compact)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer every pair of names or ids in FILE "
+                             "(one comma-separated pair per line, - for stdin)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="number of worker processes for --batch")
+    args = parser.parse_args()
+    filters = {"min_year": args.min_year, "max_year": args.max_year,
+               "min_cast": args.min_cast}
+    if args.compact and any(value is not None for value in filters.values()):
+        parser.error("--compact cannot be combined with filters")
+    if args.compact and args.movie_projection:
+        parser.error("--compact cannot be combined with --movie-projection")
+    global movie_projection
+    movie_projection = args.movie_projection
 
     # Load data from files into memory
+    if args.batch is not None:
+        load_data(args.directory, compact=args.compact, cache=args.cache,
+                  **filters)
+        if args.components:
+            load_landmarks(args.directory)
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.processes)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, args.processes)
+        return
+
     print("Loading data...")
-    load_data(directory)
+    load_data(args.directory, compact=args.compact, cache=args.cache,
+              **filters)
+    if args.components:
+        load_landmarks(args.directory)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +253,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = find_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -78,43 +262,184 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_record(path[i][1])["name"]
+            person2 = person_record(path[i + 1][1])["name"]
+            movie = movie_record(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def run_batch(infile, outfile, processes=1):
+    """
+    Answers every (source, target) pair in infile, writing CSV rows of
+    source id, target id, degrees and path to outfile.
+    Each side of a pair may be a person id or an unambiguous name.
+    Degrees is empty if either person is not found, and -1 if they are
+    not connected. Rows are grouped by source, not in input order.
+    """
+    # Group queries by source so each source is searched from only once
+    groups = {}
+    unresolved = []
+    for row in csv.reader(infile):
+        if len(row) != 2:
+            continue
+        source, target = resolve_person(row[0]), resolve_person(row[1])
+        if source is None or target is None:
+            unresolved.append(row)
+        else:
+            groups.setdefault(source, []).append(target)
+
+    writer = csv.writer(outfile)
+    for row in unresolved:
+        writer.writerow(row + ["", ""])
+
+    if processes > 1:
+        # Forked workers share the loaded graph copy-on-write
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes) as pool:
+            results = pool.imap_unordered(answer_group, groups.items(),
+                                          chunksize=16)
+            for rows in results:
+                writer.writerows(rows)
+    else:
+        for group in groups.items():
+            writer.writerows(answer_group(group))
+
+
+def answer_group(group):
+    """
+    Returns output rows for a (source, targets) group of batch queries.
+    """
+    source, targets = group
+    paths = paths_from(source, targets)
+    rows = []
+    for target in targets:
+        path = paths[target]
+        if path is None:
+            rows.append([source, target, -1, ""])
+        else:
+            steps = " ".join(f"{movie_id}:{person_id}"
+                             for movie_id, person_id in path)
+            rows.append([source, target, len(path), steps])
+    return rows
+
+
+def paths_from(source, targets):
+    """
+    Returns a dictionary mapping each target to the shortest list of
+    (movie_id, person_id) pairs from source, or None if not connected.
+    Several targets share one BFS tree from source, which stops as soon
+    as every target has been reached.
+    """
+    remaining = set(targets)
+    if len(remaining) == 1:
+        target = remaining.pop()
+        return {target: find_path(source, target)}
+
+    # Map each reached person to the (movie_id, person_id) step back
+    parents = {source: None}
+    remaining.discard(source)
+    layer = [source]
+    while layer and remaining:
+        next_layer = []
+        for person_id in layer:
+            for movie_id, neighbor in neighbors_for_person(person_id):
+                if neighbor not in parents:
+                    parents[neighbor] = (movie_id, person_id)
+                    next_layer.append(neighbor)
+                    remaining.discard(neighbor)
+        layer = next_layer
+
+    paths = {}
+    for target in targets:
+        if target not in parents:
+            paths[target] = None
+            continue
+        path = []
+        person_id = target
+        while parents[person_id] is not None:
+            movie_id, parent = parents[person_id]
+            path.append((movie_id, person_id))
+            person_id = parent
+        path.reverse()
+        paths[target] = path
+    return paths
+
+
+def resolve_person(text):
+    """
+    Returns the person id for an id or an unambiguous name,
+    without prompting. Returns None if there is no single match.
+    """
+    text = text.strip()
+    if graph is not None:
+        if text in graph.person_index:
+            return text
+        person_ids = graph.person_ids_for_name(text)
+    else:
+        if text in people:
+            return text
+        person_ids = names.get(text.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    return None
+
+
+def find_path(source, target):
+    """
+    Returns the shortest path between two people using the fastest
+    search for whichever representation of the graph is loaded.
+    """
+    # The landmark index's component ids answer unconnected pairs without
+    # searching. Landmark bounds are too loose on the small-world co-star
+    # graph to speed up bidirectional search, so connected pairs use it
+    if landmark_index is not None:
+        if not landmark_index.connected(source, target):
+            return None
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    if movie_projection:
+        return movie_projection_path(source, target)
+    return bidirectional_shortest_path(source, target)
+
+
+def shortest_path(source, target, frontier_class=DequeQueueFrontier,
+                  stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
     If no possible path, returns None.
+    If a stats dictionary is given, the number of states explored and
+    the peak size of the frontier are stored in it.
     """
     # TODO
     # Keep track of number of states explored
     num_explored = 0
+    frontier_peak = 1
 
     # Initialize frontier to just the starting position
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = frontier_class()
     frontier.add(start)
 
     # Initialize an empty explored set
     explored = set()
 
     # Keep looping until solution found
-    while True:
+    path = None
+    while not path:
 
         # If nothing left in frontier, then no path
         if frontier.empty():
-            return None
+            path = None
+            break
 
         # Choose a node from the frontier
         node = frontier.remove()
         num_explored += 1
 
-        if get_path(node, target):
-            return get_path(node, target)
+        path = get_path(node, target)
+        if path:
+            break
 
         # Mark node as explored
         explored.add(node.state)
@@ -123,9 +448,167 @@ def shortest_path(source, target):
         for movie, state in neighbors_for_person(node.state):
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=movie)
-                if get_path(child, target):
-                    return get_path(child, target)
+                path = get_path(child, target)
+                if path:
+                    break
                 frontier.add(child)
+        frontier_peak = max(frontier_peak, len(frontier.frontier))
+
+    if stats is not None:
+        stats["explored"] = num_explored
+        stats["frontier_peak"] = frontier_peak
+    return path
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both ends at once and stopping when the two searches meet.
+    If no possible path, returns None.
+    If a stats dictionary is given, the number of people expanded and
+    the peak combined size of both frontiers are stored in it.
+    """
+    if stats is not None:
+        stats["explored"] = 0
+        stats["frontier_peak"] = 1
+    if source == target:
+        return []
+
+    # Map each reached person to the (movie_id, person_id) step
+    # leading back towards the side the search started from
+    forward = {source: None}
+    backward = {target: None}
+
+    # Keep track of the current layer of each search
+    forward_layer = [source]
+    backward_layer = [target]
+
+    # Keep looping while both searches can still grow
+    while forward_layer and backward_layer:
+        if stats is not None:
+            stats["frontier_peak"] = max(
+                stats["frontier_peak"], len(forward_layer) + len(backward_layer)
+            )
+
+        # Always expand the smaller layer, keeping both searches small
+        if len(forward_layer) <= len(backward_layer):
+            if stats is not None:
+                stats["explored"] += len(forward_layer)
+            forward_layer, meeting = expand_layer(
+                forward_layer, forward, backward
+            )
+        else:
+            if stats is not None:
+                stats["explored"] += len(backward_layer)
+            backward_layer, meeting = expand_layer(
+                backward_layer, backward, forward
+            )
+
+        # The whole layer was expanded, so the meeting point is optimal
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    return None
+
+
+def expand_layer(layer, parents, other_parents):
+    """
+    Expands every person in a BFS layer, recording parents for newly
+    reached people. Returns the next layer and a person reached by both
+    searches (or None if the searches have not met yet).
+    """
+    next_layer = []
+    meeting = None
+    for person_id in layer:
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (movie_id, person_id)
+            next_layer.append(neighbor)
+            if meeting is None and neighbor in other_parents:
+                meeting = neighbor
+    return next_layer, meeting
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Joins the forward and backward search trees at the meeting person
+    into one list of (movie_id, person_id) pairs from source to target.
+    """
+    # Walk back from the meeting person to the source
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+
+    # Walk forward from the meeting person to the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def movie_projection_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching the bipartite
+    person-movie graph so that each movie's cast is scanned only once.
+    If no possible path, returns None.
+    If a stats dictionary is given, the numbers of people and movies
+    scanned are stored in it.
+    The path has the same length as the one shortest_path returns, but
+    may be a different one of several shortest paths.
+    Needs the dictionaries, not a compact graph.
+    """
+    if graph is not None:
+        raise ValueError("movie projection search needs the dictionaries, "
+                         "not a compact graph")
+    # Map each reached person to the (movie_id, person_id) step back
+    parents = {source: None}
+    scanned_movies = set()
+    people_scanned = 0
+    frontier_peak = 1
+
+    layer = [source]
+    while layer and target not in parents:
+        frontier_peak = max(frontier_peak, len(layer))
+        next_layer = []
+        for person_id in layer:
+            people_scanned += 1
+            for movie_id in people[person_id]["movies"]:
+
+                # Every co-star in this movie was reached the first time
+                if movie_id in scanned_movies:
+                    continue
+                scanned_movies.add(movie_id)
+
+                for neighbor in movies[movie_id]["stars"]:
+                    if neighbor not in parents:
+                        parents[neighbor] = (movie_id, person_id)
+                        next_layer.append(neighbor)
+        layer = next_layer
+
+    if stats is not None:
+        stats["explored"] = people_scanned
+        stats["frontier_peak"] = frontier_peak
+        stats["people_scanned"] = people_scanned
+        stats["movies_scanned"] = len(scanned_movies)
+
+    if target not in parents:
+        return None
+    path = []
+    person_id = target
+    while parents[person_id] is not None:
+        movie_id, parent = parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent
+    path.reverse()
+    return path
 
 
 def get_path(node, target):
@@ -145,13 +628,21 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if graph is not None:
+        person_ids = graph.person_ids_for_name(name)
+    else:
+        person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        candidates = candidates_for_name(name, limit=5)
+        if candidates:
+            suggestions = ", ".join(candidate["name"]
+                                    for candidate in candidates)
+            print(f"Did you mean: {suggestions}?")
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_record(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -166,11 +657,41 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def candidates_for_name(name, limit=10):
+    """
+    Returns up to limit candidate people for a name, best first,
+    without prompting. Each candidate is a dictionary with the person's
+    id, name, birth and a match score (1 for an exact match, then prefix
+    matches, then fuzzy matches by trigram similarity).
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            entries = zip(graph.person_ids, graph.person_names)
+        else:
+            entries = ((person_id, person["name"])
+                       for person_id, person in people.items())
+        name_index = NameIndex(entries)
+
+    candidates = []
+    for person_id, score in name_index.search(name, limit):
+        person = person_record(person_id)
+        candidates.append({
+            "id": person_id,
+            "name": person["name"],
+            "birth": person["birth"],
+            "score": score
+        })
+    return candidates
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -179,5 +700,25 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def person_record(person_id):
+    """
+    Returns a dictionary with the name and birth of a person,
+    from whichever representation of the graph is loaded.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_record(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie,
+    from whichever representation of the graph is loaded.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 if __name__ == "__main__":
     main()
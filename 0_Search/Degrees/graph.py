@@ -0,0 +1,297 @@
+import csv
+from array import array
+
+from snapshot import read_snapshot, snapshot_path, source_key, write_snapshot
+
+# File name of the compact graph snapshot within a data directory
+SNAPSHOT = "compact.snapshot"
+
+# Names of the CSR buffers stored in a snapshot
+BUFFERS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+
+
+class CompactGraph():
+    """
+    Compact representation of the people/movies graph.
+
+    People and movies are interned to dense integer indices, and the
+    person -> movie and movie -> person edges are stored in CSR form:
+    the neighbors of person i are
+    person_movies[person_offsets[i]:person_offsets[i + 1]],
+    and likewise for movies.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_people):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+        # Maps string ids back to dense indices
+        self.person_index = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+        self.movie_index = {
+            movie_id: i for i, movie_id in enumerate(movie_ids)
+        }
+
+        # Maps lowercase names to a tuple of person indices
+        self.name_index = {}
+        for i, name in enumerate(person_names):
+            key = name.lower()
+            self.name_index[key] = self.name_index.get(key, ()) + (i,)
+
+    @classmethod
+    def from_directory(cls, directory, cache=True):
+        """
+        Load the graph for a directory, from its snapshot if one is
+        up to date, otherwise from the CSV files (writing a new snapshot
+        if cache is True).
+        """
+        key = source_key(directory)
+        path = snapshot_path(directory, SNAPSHOT, key)
+        if cache:
+            graph = cls.load(path, key)
+            if graph is not None:
+                return graph
+        graph = cls.from_csv(directory)
+        if cache:
+            try:
+                graph.save(path, key)
+            except OSError:
+                pass
+        return graph
+
+    @classmethod
+    def load(cls, path, key):
+        """
+        Load the graph from a snapshot, memory-mapping the CSR buffers.
+        Returns None if there is no snapshot matching key.
+        """
+        snapshot = read_snapshot(path, key)
+        if snapshot is None:
+            return None
+        strings, buffers = snapshot
+        return cls(*strings, *(buffers[name] for name in BUFFERS))
+
+    def save(self, path, key):
+        """
+        Save the graph to a snapshot tagged with key.
+        """
+        strings = (self.person_ids, self.person_names, self.person_births,
+                   self.movie_ids, self.movie_titles, self.movie_years)
+        buffers = {name: getattr(self, name) for name in BUFFERS}
+        write_snapshot(path, key, strings, buffers)
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load the graph from the CSV files in a directory.
+        """
+        # Load people
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        # Load movies
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # Load stars as parallel arrays of person and movie indices,
+        # skipping duplicates and rows for unknown people or movies
+        seen = set()
+        edge_people, edge_movies = array("i"), array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is None or movie is None or (person, movie) in seen:
+                    continue
+                seen.add((person, movie))
+                edge_people.append(person)
+                edge_movies.append(movie)
+        del seen
+
+        person_offsets, person_movies = build_csr(
+            len(person_ids), edge_people, edge_movies
+        )
+        movie_offsets, movie_people = build_csr(
+            len(movie_ids), edge_movies, edge_people
+        )
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_people)
+
+    def person(self, person_id):
+        """
+        Returns a dictionary with the name and birth of a person.
+        """
+        i = self.person_index[person_id]
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        """
+        Returns a dictionary with the title and year of a movie.
+        """
+        i = self.movie_index[movie_id]
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the list of person ids with a given (case-insensitive) name.
+        """
+        return [self.person_ids[i]
+                for i in self.name_index.get(name.lower(), ())]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people
+        who starred with the person at a given index.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+        for k in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[k]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_people[j]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        return {(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in self.neighbors(
+                    self.person_index[person_id])}
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using a bidirectional
+        BFS over the CSR buffers.
+        If no possible path, returns None.
+        If a stats dictionary is given, the number of people expanded and
+        the peak combined size of both frontiers are stored in it.
+        """
+        if stats is not None:
+            stats["explored"] = 0
+            stats["frontier_peak"] = 1
+        source = self.person_index[source]
+        target = self.person_index[target]
+        if source == target:
+            return []
+
+        # Parent person and connecting movie for each reached person,
+        # for the search from the source and the search from the target.
+        # Unreached people have a parent of -1; the roots point to themselves.
+        n = len(self.person_ids)
+        forward = (array("i", [-1]) * n, array("i", [-1]) * n)
+        backward = (array("i", [-1]) * n, array("i", [-1]) * n)
+        forward[0][source] = source
+        backward[0][target] = target
+
+        forward_layer = [source]
+        backward_layer = [target]
+        while forward_layer and backward_layer:
+            if stats is not None:
+                stats["frontier_peak"] = max(
+                    stats["frontier_peak"],
+                    len(forward_layer) + len(backward_layer)
+                )
+            if len(forward_layer) <= len(backward_layer):
+                if stats is not None:
+                    stats["explored"] += len(forward_layer)
+                forward_layer, meeting = self.expand_layer(
+                    forward_layer, forward, backward
+                )
+            else:
+                if stats is not None:
+                    stats["explored"] += len(backward_layer)
+                backward_layer, meeting = self.expand_layer(
+                    backward_layer, backward, forward
+                )
+            if meeting is not None:
+                return self.join_paths(meeting, forward, backward)
+        return None
+
+    def expand_layer(self, layer, parents, other_parents):
+        """
+        Expands every person in a BFS layer. Returns the next layer and
+        a person reached by both searches (or None).
+        """
+        parent_people, parent_movies = parents
+        other_people = other_parents[0]
+        next_layer = []
+        meeting = None
+        for person in layer:
+            for movie, neighbor in self.neighbors(person):
+                if parent_people[neighbor] != -1:
+                    continue
+                parent_people[neighbor] = person
+                parent_movies[neighbor] = movie
+                next_layer.append(neighbor)
+                if meeting is None and other_people[neighbor] != -1:
+                    meeting = neighbor
+        return next_layer, meeting
+
+    def join_paths(self, meeting, forward, backward):
+        """
+        Joins both search trees at the meeting person into a list of
+        (movie_id, person_id) pairs from source to target.
+        """
+        path = []
+        person = meeting
+        while forward[0][person] != person:
+            path.append((forward[1][person], person))
+            person = forward[0][person]
+        path.reverse()
+
+        person = meeting
+        while backward[0][person] != person:
+            movie = backward[1][person]
+            person = backward[0][person]
+            path.append((movie, person))
+
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+
+def build_csr(size, rows, columns):
+    """
+    Builds CSR offset and index arrays from parallel arrays
+    of edge rows and columns.
+    """
+    offsets = array("i", [0]) * (size + 1)
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    indices = array("i", [0]) * len(rows)
+    position = array("i", offsets)
+    for row, column in zip(rows, columns):
+        indices[position[row]] = column
+        position[row] += 1
+    return offsets, indices
@@ -0,0 +1,207 @@
+"""
+Landmark distance index for Degrees path queries.
+
+BFS distances from a few high-degree landmark people give lower bounds on
+the distance between any two people (by the triangle inequality), which
+guide an A* search (ALT). Connected component ids let queries between
+people in different components be answered without searching.
+
+degrees.py only uses the component ids, building the index with no
+landmarks: on the small-world co-star graph the bounds are too loose for
+A* to beat bidirectional BFS. benchmark.py compares the two.
+"""
+
+import heapq
+from array import array
+
+from snapshot import read_snapshot, snapshot_path, write_snapshot
+
+# File name of the landmark indexes within a data directory,
+# before the digest of the load options is added
+INDEX = "landmarks.index"
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 0xFFFF
+
+
+class LandmarkIndex():
+
+    def __init__(self, person_ids, landmarks, distances, components):
+        # Person ids, in the order used by the distance and component arrays
+        self.person_ids = person_ids
+        self.position = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+
+        # Person ids of the landmarks, and for each an array of distances
+        self.landmarks = landmarks
+        self.distances = distances
+
+        # Connected component id of each person
+        self.components = components
+
+    @classmethod
+    def build(cls, person_ids, neighbors, count=16):
+        """
+        Builds an index over person_ids, where neighbors(person_id)
+        returns (movie_id, person_id) pairs, using the count people
+        with the most co-stars as landmarks.
+        """
+        position = {person_id: i for i, person_id in enumerate(person_ids)}
+
+        # Label connected components, recording each person's degree
+        components = array("i", [-1]) * len(person_ids)
+        degree = array("i", [0]) * len(person_ids)
+        component = 0
+        for start in range(len(person_ids)):
+            if components[start] != -1:
+                continue
+            components[start] = component
+            layer = [start]
+            while layer:
+                next_layer = []
+                for i in layer:
+                    co_stars = {
+                        person for _, person in neighbors(person_ids[i])
+                    }
+                    degree[i] = len(co_stars)
+                    for person in co_stars:
+                        j = position[person]
+                        if components[j] == -1:
+                            components[j] = component
+                            next_layer.append(j)
+                layer = next_layer
+            component += 1
+
+        # Choose the highest-degree people as landmarks
+        order = sorted(range(len(person_ids)), key=lambda i: -degree[i])
+        landmarks = [person_ids[i] for i in order[:count]]
+
+        # BFS from every landmark
+        distances = []
+        for landmark in landmarks:
+            distance = array("H", [UNREACHABLE]) * len(person_ids)
+            distance[position[landmark]] = 0
+            layer = [landmark]
+            depth = 0
+            while layer:
+                depth += 1
+                next_layer = []
+                for person_id in layer:
+                    for _, neighbor in neighbors(person_id):
+                        j = position[neighbor]
+                        if distance[j] == UNREACHABLE:
+                            distance[j] = min(depth, UNREACHABLE - 1)
+                            next_layer.append(neighbor)
+                layer = next_layer
+            distances.append(distance)
+
+        return cls(person_ids, landmarks, distances, components)
+
+    @classmethod
+    def from_directory(cls, directory, key, person_ids, neighbors, count=16):
+        """
+        Loads the index saved next to a dataset if it matches key,
+        otherwise builds it and saves it there.
+        """
+        key = key + (count,)
+        path = snapshot_path(directory, INDEX, key)
+        index = cls.load(path, key)
+        if index is None:
+            index = cls.build(person_ids, neighbors, count)
+            try:
+                index.save(path, key)
+            except OSError:
+                pass
+        return index
+
+    @classmethod
+    def load(cls, path, key):
+        """
+        Loads an index from a file, returning None if it does not match key.
+        """
+        snapshot = read_snapshot(path, key)
+        if snapshot is None:
+            return None
+        (person_ids, landmarks), buffers = snapshot
+        distances = [buffers[f"distance{i}"] for i in range(len(landmarks))]
+        return cls(person_ids, landmarks, distances, buffers["components"])
+
+    def save(self, path, key):
+        """
+        Saves the index to a file tagged with key.
+        """
+        buffers = {"components": self.components}
+        for i, distance in enumerate(self.distances):
+            buffers[f"distance{i}"] = distance
+        write_snapshot(path, key, (self.person_ids, self.landmarks), buffers)
+
+    def connected(self, a, b):
+        """
+        Returns True if two people are in the same connected component.
+        """
+        return (self.components[self.position[a]]
+                == self.components[self.position[b]])
+
+    def lower_bound(self, a, b):
+        """
+        Returns a lower bound on the number of degrees between two
+        people in the same connected component.
+        """
+        i, j = self.position[a], self.position[b]
+        bound = 0
+        for distance in self.distances:
+            if distance[i] != UNREACHABLE and distance[j] != UNREACHABLE:
+                bound = max(bound, abs(distance[i] - distance[j]))
+        return bound
+
+    def shortest_path(self, source, target, neighbors, stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect the source to the target, using A* search guided by the
+        landmark lower bounds. If no possible path, returns None.
+        If a stats dictionary is given, the number of people expanded and
+        the peak size of the frontier are stored in it.
+        """
+        if stats is not None:
+            stats["explored"] = 0
+            stats["frontier_peak"] = 0
+        if not self.connected(source, target):
+            return None
+
+        # Map each reached person to their best known distance and parent
+        cost = {source: 0}
+        parents = {source: None}
+        explored = set()
+
+        # Order the frontier by estimated total distance, then by insertion
+        counter = 0
+        frontier = [(self.lower_bound(source, target), counter, source)]
+        while frontier:
+            if stats is not None:
+                stats["frontier_peak"] = max(stats["frontier_peak"],
+                                             len(frontier))
+            _, _, person_id = heapq.heappop(frontier)
+            if person_id in explored:
+                continue
+            explored.add(person_id)
+            if stats is not None:
+                stats["explored"] = len(explored)
+            if person_id == target:
+                path = []
+                while parents[person_id] is not None:
+                    movie_id, parent = parents[person_id]
+                    path.append((movie_id, person_id))
+                    person_id = parent
+                path.reverse()
+                return path
+
+            depth = cost[person_id] + 1
+            for movie_id, neighbor in neighbors(person_id):
+                if neighbor not in cost or depth < cost[neighbor]:
+                    cost[neighbor] = depth
+                    parents[neighbor] = (movie_id, person_id)
+                    counter += 1
+                    estimate = depth + self.lower_bound(neighbor, target)
+                    heapq.heappush(frontier, (estimate, counter, neighbor))
+        return None
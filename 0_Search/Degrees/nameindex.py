@@ -0,0 +1,269 @@
+"""
+Name lookup index for Degrees.
+
+Lowercase names are kept in a sorted list for prefix lookup by binary
+search. For fuzzy matching, a word index maps each word to the names
+containing it, and a sorted array of hashed single-character deletions of
+every word finds the words within one typo of a query word (a symmetric
+deletion index). A trigram index maps each three-character substring to
+the names containing it, for queries with no word close to any indexed
+word.
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Number of candidate names ranked by similarity
+MAX_CANDIDATES = 64
+
+# Most names containing a word close to a query word examined per query
+MAX_SCANNED = 512
+
+# Words shorter than this are only matched exactly
+MIN_FUZZY_WORD = 3
+
+
+class NameIndex():
+
+    def __init__(self, entries):
+        """
+        Builds the index from an iterable of (person_id, name) pairs.
+        """
+        # Map each lowercase name to the person ids with that name
+        ids = {}
+        for person_id, name in entries:
+            ids.setdefault(name.lower(), []).append(person_id)
+
+        # Sorted lowercase names, and the person ids for each
+        self.keys = sorted(ids)
+        self.ids = [tuple(ids[key]) for key in self.keys]
+
+        # Map each trigram to the positions of the names containing it
+        trigrams = {}
+        for i, key in enumerate(self.keys):
+            for trigram in trigrams_for(key):
+                trigrams.setdefault(trigram, array("i")).append(i)
+        self.trigrams = trigrams
+
+        # Map each word to the positions of the names containing it
+        words = {}
+        for i, key in enumerate(self.keys):
+            for word in set(key.split()):
+                words.setdefault(word, array("i")).append(i)
+        self.words = words
+        self.vocabulary = list(words)
+
+        # Every variant of every word (the word and its single-character
+        # deletions), as the variant's hash in the high bits and the
+        # word's number in the low bits, sorted so the words with a given
+        # variant are found by binary search
+        self.word_bits = max(len(self.vocabulary).bit_length(), 1)
+        self.hash_mask = (1 << (62 - self.word_bits)) - 1
+        variants = []
+        for number, word in enumerate(self.vocabulary):
+            for variant in variants_for(word):
+                variants.append(
+                    (hash(variant) & self.hash_mask) << self.word_bits | number
+                )
+        variants.sort()
+        self.variants = array("q", variants)
+
+    def exact(self, name):
+        """
+        Returns the person ids with exactly this (case-insensitive) name.
+        """
+        key = name.lower()
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return list(self.ids[i])
+        return []
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to limit (name, person_ids) pairs for names
+        starting with prefix, in alphabetical order.
+        """
+        prefix = prefix.lower()
+        matches = []
+        i = bisect_left(self.keys, prefix)
+        while (i < len(self.keys) and len(matches) < limit
+               and self.keys[i].startswith(prefix)):
+            matches.append((self.keys[i], self.ids[i]))
+            i += 1
+        return matches
+
+    def similar_words(self, word):
+        """
+        Returns the indexed words that share a variant with word: those
+        one substitution, insertion, deletion or swap of adjacent
+        characters away from it, and some two edits away.
+        """
+        similar = set()
+        word_mask = (1 << self.word_bits) - 1
+        for variant in variants_for(word):
+            hashed = hash(variant) & self.hash_mask
+            i = bisect_left(self.variants, hashed << self.word_bits)
+            while (i < len(self.variants)
+                   and self.variants[i] >> self.word_bits == hashed):
+                candidate = self.vocabulary[self.variants[i] & word_mask]
+
+                # Rule out words whose variant only shares its hash
+                if variant in variants_for(candidate):
+                    similar.add(candidate)
+                i += 1
+        return similar
+
+    def fuzzy(self, name, limit=10):
+        """
+        Returns up to limit (similarity, name, person_ids) tuples for the
+        names most similar to name by trigrams, best first. Candidates are
+        names with a word close to each query word, or failing that to
+        as many query words as possible.
+        """
+        key = name.lower()
+        query = trigrams_for(key)
+        if not query:
+            return []
+
+        # Find the words close to each query word
+        matches = []
+        for word in set(key.split()):
+            similar = self.similar_words(word)
+            if similar:
+                matches.append((word, similar))
+        if not matches:
+            return self.fuzzy_trigrams(query, limit)
+
+        # Scan the names containing the words close to the query word in
+        # fewest names, closest words first, counting the other query
+        # words each name has a close word for
+        matches.sort(key=lambda match: sum(len(self.words[word])
+                                           for word in match[1]))
+        word, similar = matches[0]
+        trigrams = trigrams_for(word)
+        order = sorted(similar, key=lambda other: (
+            edits(word, other), -len(trigrams & trigrams_for(other))
+        ))
+        candidates = {}
+        for other in order:
+            if len(candidates) >= MAX_SCANNED:
+                break
+            for i in self.words[other][:MAX_SCANNED - len(candidates)]:
+                if i not in candidates:
+                    words = set(self.keys[i].split())
+                    candidates[i] = sum(1 for _, match in matches[1:]
+                                        if not match.isdisjoint(words))
+
+        # Rank the names matching the most query words by similarity
+        best = sorted(candidates, key=lambda i: -candidates[i])
+        return self.rank(query, best[:MAX_CANDIDATES], limit)
+
+    def fuzzy_trigrams(self, query, limit=10):
+        """
+        Returns up to limit (similarity, name, person_ids) tuples for the
+        names sharing the most trigrams in query, best first. Slower than
+        fuzzy, since common trigrams have long postings to merge.
+        """
+        # Count the query trigrams each name shares by merging postings,
+        # shortest first. A name gains at most one shared trigram per
+        # posting left, so stop once no name outside the best candidates
+        # could catch up with them
+        postings = sorted(
+            (self.trigrams.get(trigram, ()) for trigram in query), key=len
+        )
+        counts = Counter()
+        for scanned, posting in enumerate(postings, 1):
+            counts.update(posting)
+            remaining = len(postings) - scanned
+            if remaining and len(counts) > MAX_CANDIDATES:
+                top = heapq.nlargest(MAX_CANDIDATES + 1, counts.values())
+                if top[-2] >= top[-1] + remaining:
+                    break
+        candidates = [i for i, _ in counts.most_common(MAX_CANDIDATES)]
+        return self.rank(query, candidates, limit)
+
+    def rank(self, query, candidates, limit):
+        """
+        Returns up to limit (similarity, name, person_ids) tuples for the
+        candidate name positions, by trigram similarity (Dice coefficient)
+        to the query trigrams.
+        """
+        scored = []
+        for i in candidates:
+            trigrams = trigrams_for(self.keys[i])
+            shared = len(query & trigrams)
+            similarity = 2 * shared / (len(query) + len(trigrams))
+            scored.append((similarity, self.keys[i], self.ids[i]))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return scored[:limit]
+
+    def search(self, name, limit=10):
+        """
+        Returns up to limit (person_id, score) pairs for a name, best
+        first: exact matches score 1, then names starting with it,
+        then fuzzy matches scored by trigram similarity.
+        """
+        if not name.strip():
+            return []
+        results = []
+        seen = set()
+
+        def add(person_ids, score):
+            for person_id in person_ids:
+                if person_id not in seen and len(results) < limit:
+                    seen.add(person_id)
+                    results.append((person_id, score))
+
+        add(self.exact(name), 1.0)
+        if len(results) >= limit:
+            return results
+        for _, person_ids in self.prefix(name, limit):
+            add(person_ids, 0.99)
+        if len(results) < limit:
+            for similarity, _, person_ids in self.fuzzy(name, limit):
+                add(person_ids, round(min(similarity, 0.98), 3))
+        return results
+
+
+def trigrams_for(text):
+    """
+    Returns the set of trigrams of a string, padded with spaces
+    so that the start and end of words are represented.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+
+def variants_for(word):
+    """
+    Returns the set of a word and its single-character deletions, or just
+    the word if it is too short to match fuzzily.
+    """
+    if len(word) < MIN_FUZZY_WORD:
+        return {word}
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def edits(word, other):
+    """
+    Returns 0 for the same word, 1 for words one substitution, insertion,
+    deletion or swap of adjacent characters apart, and 2 otherwise.
+    """
+    if word == other:
+        return 0
+    if len(word) == len(other):
+        differences = [i for i in range(len(word)) if word[i] != other[i]]
+        if len(differences) == 1:
+            return 1
+        if (len(differences) == 2 and differences[1] == differences[0] + 1
+                and word[differences[0]] == other[differences[1]]
+                and word[differences[1]] == other[differences[0]]):
+            return 1
+        return 2
+    shorter, longer = sorted((word, other), key=len)
+    if len(longer) - len(shorter) == 1 and shorter in variants_for(longer):
+        return 1
+    return 2
@@ -0,0 +1,129 @@
+"""
+Versioned binary snapshots of loaded Degrees data.
+
+A snapshot file holds a header, a pickled object and a sequence of raw
+integer buffers. The header records the snapshot format version and a key
+describing the CSV files it was built from, so a stale snapshot is
+ignored. Integer buffers are memory-mapped on load rather than copied.
+"""
+
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+from array import array
+
+MAGIC = b"DEGSNAP\0"
+VERSION = 1
+
+# Magic, version and header length
+PREAMBLE = struct.Struct("<8sIQ")
+
+# Buffers are aligned to this many bytes within the file
+ALIGNMENT = 8
+
+# The CSV files a snapshot is built from
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def source_key(directory, *extra):
+    """
+    Returns a key identifying the CSV files in a directory
+    by their names, modification times and sizes.
+    Extra values (such as load options) are appended to the key.
+    """
+    key = []
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        key.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(key) + extra
+
+
+def snapshot_path(directory, name, key):
+    """
+    Returns the path in directory of the snapshot file called name for a
+    source key, with a digest of the key's extra values inserted before
+    the extension, so that each combination of load options keeps its
+    own snapshot while changed CSV files replace the stale one.
+    """
+    digest = hashlib.sha1(repr(key[len(SOURCES):]).encode()).hexdigest()
+    stem, extension = os.path.splitext(name)
+    return os.path.join(directory, f"{stem}.{digest[:12]}{extension}")
+
+
+def write_snapshot(path, key, obj, buffers=None):
+    """
+    Writes a snapshot of a picklable object and a dictionary of
+    integer arrays to path, tagged with a source key.
+    """
+    buffers = buffers or {}
+    layout = []
+    offset = 0
+    for name, buffer in buffers.items():
+        nbytes = len(buffer) * buffer.itemsize
+        layout.append((name, buffer.typecode, offset, len(buffer)))
+        offset += nbytes + (-nbytes % ALIGNMENT)
+
+    header = pickle.dumps(
+        {"key": key, "layout": layout, "object": obj},
+        protocol=pickle.HIGHEST_PROTOCOL
+    )
+    start = PREAMBLE.size + len(header)
+    start += -start % ALIGNMENT
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * (start - f.tell()))
+        for name, buffer in buffers.items():
+            nbytes = len(buffer) * buffer.itemsize
+            f.write(buffer.tobytes())
+            f.write(b"\0" * (-nbytes % ALIGNMENT))
+    os.replace(temporary, path)
+
+
+def read_snapshot(path, key):
+    """
+    Reads a snapshot written by write_snapshot.
+    Returns a tuple of the object and a dictionary of integer buffers
+    (memory-mapped where possible), or None if there is no usable
+    snapshot for the given key.
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return None
+
+    with f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            return None
+        magic, version, length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC or version != VERSION:
+            return None
+        try:
+            header = pickle.loads(f.read(length))
+        except Exception:
+            return None
+        if header["key"] != key:
+            return None
+
+        start = PREAMBLE.size + length
+        start += -start % ALIGNMENT
+        buffers = {}
+        if header["layout"]:
+            try:
+                data = memoryview(
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+            except (OSError, ValueError):
+                f.seek(0)
+                data = memoryview(f.read())
+            for name, typecode, offset, count in header["layout"]:
+                itemsize = array(typecode).itemsize
+                begin = start + offset
+                buffers[name] = data[begin:begin + count * itemsize].cast(typecode)
+    return header["object"], buffers
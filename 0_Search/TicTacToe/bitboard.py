@@ -0,0 +1,150 @@
+"""
+Bitboard representation of a Tic Tac Toe board.
+
+A board is a pair of 9-bit masks (x, o), where bit 3 * i + j is set
+when X (or O) has played in cell (i, j).
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Mask with every cell set
+FULL = 0b111111111
+
+# The eight winning lines: rows, columns and diagonals
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100
+)
+
+# Whether each of the 512 masks contains a winning line
+WINS = tuple(any(mask & line == line for line in WIN_MASKS)
+             for mask in range(FULL + 1))
+
+# Number of cells set in each of the 512 masks
+POPCOUNT = tuple(bin(mask).count("1") for mask in range(FULL + 1))
+
+
+def from_board(board):
+    """
+    Returns the (x, o) masks for a list-of-lists board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (3 * i + j)
+            elif cell == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_board(x, o):
+    """
+    Returns the list-of-lists board for (x, o) masks.
+    """
+    board = []
+    for i in range(3):
+        row = []
+        for j in range(3):
+            cell = 1 << (3 * i + j)
+            if x & cell:
+                row.append(X)
+            elif o & cell:
+                row.append(O)
+            else:
+                row.append(EMPTY)
+        board.append(row)
+    return board
+
+
+def to_action(move):
+    """
+    Returns the (i, j) action for a single-bit move mask.
+    """
+    return divmod(move.bit_length() - 1, 3)
+
+
+def to_move(action):
+    """
+    Returns the single-bit move mask for an (i, j) action.
+    """
+    return 1 << (3 * action[0] + action[1])
+
+
+def x_to_move(x, o):
+    """
+    Returns True if it is X's turn (X always moves first).
+    """
+    return POPCOUNT[x] == POPCOUNT[o]
+
+
+def utility(x, o):
+    """
+    Returns 1 if X has won, -1 if O has won, 0 if the board is full
+    with no winner, or None if the game is not over.
+    """
+    if WINS[x]:
+        return 1
+    if WINS[o]:
+        return -1
+    if x | o == FULL:
+        return 0
+    return None
+
+
+def moves(x, o):
+    """
+    Yields the single-bit masks of every empty cell, lowest cell first.
+    """
+    free = FULL & ~(x | o)
+    while free:
+        move = free & -free
+        yield move
+        free ^= move
+
+
+def transform_cell(cell, symmetry):
+    """
+    Returns the cell index that cell (0-8) moves to under one of the
+    8 symmetries of the square: symmetry & 3 quarter turns clockwise,
+    preceded by a mirror across the vertical axis if symmetry & 4.
+    """
+    i, j = divmod(cell, 3)
+    if symmetry & 4:
+        j = 2 - j
+    for _ in range(symmetry & 3):
+        i, j = j, 2 - i
+    return 3 * i + j
+
+
+# Image of every mask under every symmetry
+TRANSFORMS = tuple(
+    tuple(sum(1 << transform_cell(cell, symmetry)
+              for cell in range(9) if mask >> cell & 1)
+          for mask in range(FULL + 1))
+    for symmetry in range(8)
+)
+
+# The symmetry undoing each symmetry
+INVERSES = tuple(
+    next(inverse for inverse in range(8)
+         if all(TRANSFORMS[inverse][TRANSFORMS[symmetry][1 << cell]]
+                == 1 << cell for cell in range(9)))
+    for symmetry in range(8)
+)
+
+
+def canonical(x, o):
+    """
+    Returns (x, o, symmetry) for the smallest of the 8 symmetric images
+    of a board, where symmetry maps the board to that image.
+    """
+    best = None
+    for symmetry, table in enumerate(TRANSFORMS):
+        image = (table[x], table[o], symmetry)
+        if best is None or image < best:
+            best = image
+    return best
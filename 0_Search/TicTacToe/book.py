@@ -0,0 +1,111 @@
+"""
+Opening book for Tic Tac Toe.
+
+Stores the minimax value and a best move for every reachable
+non-terminal position, with the 8 symmetries of the board folded into
+one canonical form, so that minimax can answer any position with a
+table lookup. The book is generated offline with `python book.py` and
+loaded on the first lookup.
+"""
+
+import os
+import struct
+
+import bitboard
+
+# Location of the generated book
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "book.bin")
+
+MAGIC = b"TTTBOOK1"
+
+# Canonical x and o masks, value and best move cell
+RECORD = struct.Struct("<HHbB")
+
+# Maps canonical (x, o) masks to (value, move cell), once loaded
+book = None
+
+
+def load(path=BOOK_FILE):
+    """
+    Loads the book from path, returning an empty book if the file
+    is missing or not a book.
+    """
+    entries = {}
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return entries
+    if not data.startswith(MAGIC):
+        return entries
+    for x, o, value, cell in RECORD.iter_unpack(data[len(MAGIC):]):
+        entries[(x, o)] = (value, cell)
+    return entries
+
+
+def lookup(x, o):
+    """
+    Returns (value, move) for the (x, o) bitboard, where move is a
+    single-bit mask, or None if the position is not in the book.
+    """
+    global book
+    if book is None:
+        book = load()
+    cx, co, symmetry = bitboard.canonical(x, o)
+    entry = book.get((cx, co))
+    if entry is None:
+        return None
+    value, cell = entry
+    move = bitboard.TRANSFORMS[bitboard.INVERSES[symmetry]][1 << cell]
+    return value, move
+
+
+def solve():
+    """
+    Returns the book entries for every reachable non-terminal position,
+    as a dictionary from canonical (x, o) to (value, move cell).
+    """
+    entries = {}
+
+    def value(x, o):
+        # Returns the minimax value of a position, recording it if new
+        utility = bitboard.utility(x, o)
+        if utility is not None:
+            return utility
+        cx, co, _ = bitboard.canonical(x, o)
+        if (cx, co) in entries:
+            return entries[(cx, co)][0]
+
+        # Search the canonical image, taking the lowest best cell
+        x_turn = bitboard.x_to_move(cx, co)
+        best = None
+        for move in bitboard.moves(cx, co):
+            if x_turn:
+                score = value(cx | move, co)
+            else:
+                score = value(cx, co | move)
+            if (best is None or (x_turn and score > best[0])
+                    or (not x_turn and score < best[0])):
+                best = (score, move.bit_length() - 1)
+        entries[(cx, co)] = best
+        return best[0]
+
+    value(0, 0)
+    return entries
+
+
+def generate(path=BOOK_FILE):
+    """
+    Solves every position and writes the book to path.
+    """
+    entries = solve()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for (x, o), (value, cell) in sorted(entries.items()):
+            f.write(RECORD.pack(x, o, value, cell))
+    return len(entries)
+
+
+if __name__ == "__main__":
+    print(f"Wrote {generate()} positions to {BOOK_FILE}")
@@ -0,0 +1,302 @@
+"""
+m,n,k-game player: k in a row on a board with m rows and n columns.
+
+Provides the same initial_state/player/actions/result/winner/terminal/
+utility/minimax API as tictactoe.py, as methods of an MNKGame. Boards
+too large for full minimax are searched with iterative-deepening
+alpha-beta under a time budget per move, with a heuristic evaluation of
+the lines still open to each player.
+"""
+
+import math
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Score of a won position, before subtracting the number of stones played
+# so that quicker wins score higher
+WIN = 1000000
+
+# Check the clock (and for cancellation) once every this many nodes
+CLOCK_INTERVAL = 1024
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class MNKGame():
+
+    X = X
+    O = O
+    EMPTY = EMPTY
+
+    def __init__(self, rows=3, columns=3, k=3, time_limit=1.0):
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.time_limit = time_limit
+        self.cells = rows * columns
+        self.full = (1 << self.cells) - 1
+
+        # Every run of k cells in a row, column or diagonal, as a mask
+        self.lines = []
+        for i in range(rows):
+            for j in range(columns):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < columns:
+                        self.lines.append(sum(
+                            1 << self.cell(i + di * step, j + dj * step)
+                            for step in range(k)
+                        ))
+
+        # The lines through each cell
+        self.cell_lines = [
+            [line for line in self.lines if line >> cell & 1]
+            for cell in range(self.cells)
+        ]
+
+        # Heuristic weight of a line holding count stones of one player
+        self.weights = [0] + [10 ** count for count in range(k)]
+
+        # Rank of each cell by distance from the center, nearest first
+        center = ((rows - 1) / 2, (columns - 1) / 2)
+        by_distance = sorted(
+            range(self.cells),
+            key=lambda cell: (abs(cell // columns - center[0])
+                              + abs(cell % columns - center[1]), cell)
+        )
+        self.center_rank = [0] * self.cells
+        for rank, cell in enumerate(by_distance):
+            self.center_rank[cell] = rank
+
+        # Event that stops the current search early when set
+        self.cancel = None
+
+        # Maps (x, o) bitboards to (depth, flag, value, move) entries,
+        # kept between moves of a game
+        self.table = {}
+
+        # History heuristic: how often each move caused a cutoff
+        self.history = [0] * self.cells
+
+    def cell(self, i, j):
+        return i * self.columns + j
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.columns for _ in range(self.rows)]
+
+    def bitboard(self, board):
+        """
+        Returns the (x, o) masks for a board.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << self.cell(i, j)
+                elif cell == O:
+                    o |= 1 << self.cell(i, j)
+        return x, o
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x, o = self.bitboard(board)
+        return X if bin(x).count("1") == bin(o).count("1") else O
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        if self.terminal(board):
+            return set()
+        return {(i, j) for i, row in enumerate(board)
+                for j, cell in enumerate(row) if cell == EMPTY}
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the board.
+        """
+        if action not in self.actions(board):
+            raise Exception("Invalid move")
+        next_board = [list(row) for row in board]
+        next_board[action[0]][action[1]] = self.player(board)
+        return next_board
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = self.bitboard(board)
+        if self.has_line(x):
+            return X
+        if self.has_line(o):
+            return O
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        x, o = self.bitboard(board)
+        return (self.has_line(x) or self.has_line(o)
+                or x | o == self.full)
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        winner = self.winner(board)
+        if winner == X:
+            return 1
+        if winner == O:
+            return -1
+        return 0
+
+    def has_line(self, mask):
+        return any(mask & line == line for line in self.lines)
+
+    def minimax(self, board, cancel=None):
+        """
+        Returns the best action found for the current player on the board
+        within the time budget, searching one ply deeper at a time.
+        If cancel (a threading.Event) is set, the search stops early and
+        returns the best action found so far.
+        """
+        if self.terminal(board):
+            return None
+        x, o = self.bitboard(board)
+        if self.player(board) == X:
+            us, them = x, o
+        else:
+            us, them = o, x
+
+        self.deadline = time.perf_counter() + self.time_limit
+        self.cancel = cancel
+        self.nodes = 0
+        empty = self.cells - bin(x | o).count("1")
+        best_move = None
+        for depth in range(1, empty + 1):
+            try:
+                score, move = self.root(us, them, depth, best_move)
+            except SearchTimeout:
+                break
+            best_move = move
+
+            # Stop once the result is known for certain
+            if abs(score) >= WIN - self.cells:
+                break
+
+        # Fall back to the first ordered move if no depth finished
+        if best_move is None:
+            best_move = self.ordered_moves(us, them, None)[0]
+        return divmod(best_move.bit_length() - 1, self.columns)
+
+    def root(self, us, them, depth, first):
+        """
+        Searches every move at the root to depth, trying first before the
+        rest. Returns the best score and move for the player to move.
+        """
+        best_score, best_move = -math.inf, None
+        alpha = -math.inf
+        for move in self.ordered_moves(us, them, first):
+            score = -self.negamax(them, us | move, move, depth - 1,
+                                  -math.inf, -alpha)
+            if score > best_score:
+                best_score, best_move = score, move
+                alpha = max(alpha, score)
+        return best_score, best_move
+
+    def negamax(self, us, them, last, depth, alpha, beta):
+        """
+        Returns the score of a position for the player to move (us),
+        where the opponent just played last, searching depth more plies.
+        """
+        self.nodes += 1
+        if self.nodes % CLOCK_INTERVAL == 0:
+            if (time.perf_counter() > self.deadline
+                    or self.cancel is not None and self.cancel.is_set()):
+                raise SearchTimeout
+
+        # The opponent's last move may have completed a line
+        stones = bin(us | them).count("1")
+        last_cell = last.bit_length() - 1
+        if any(them & line == line for line in self.cell_lines[last_cell]):
+            return -(WIN - stones)
+        if us | them == self.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(us, them)
+
+        key = (us, them)
+        entry = self.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, flag, value, table_move = entry
+            if entry_depth >= depth:
+                if flag == "exact":
+                    return value
+                if flag == "lower" and value >= beta:
+                    return value
+                if flag == "upper" and value <= alpha:
+                    return value
+
+        original_alpha = alpha
+        best_score, best_move = -math.inf, None
+        for move in self.ordered_moves(us, them, table_move):
+            score = -self.negamax(them, us | move, move, depth - 1,
+                                  -beta, -alpha)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.history[move.bit_length() - 1] += depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = "upper"
+        elif best_score >= beta:
+            flag = "lower"
+        else:
+            flag = "exact"
+        self.table[key] = (depth, flag, best_score, best_move)
+        return best_score
+
+    def ordered_moves(self, us, them, first):
+        """
+        Returns the empty cells as single-bit masks, with first (if any)
+        leading, then by history score and closeness to the center.
+        """
+        free = self.full & ~(us | them)
+        cells = [cell for cell in range(self.cells) if free >> cell & 1]
+        cells.sort(key=lambda cell: (-self.history[cell],
+                                     self.center_rank[cell]))
+        moves = [1 << cell for cell in cells]
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def evaluate(self, us, them):
+        """
+        Returns a heuristic score for the player to move: lines holding
+        only their stones count for them, and only the opponent's against.
+        """
+        score = 0
+        weights = self.weights
+        for line in self.lines:
+            ours = us & line
+            theirs = them & line
+            if ours and not theirs:
+                score += weights[bin(ours).count("1")]
+            elif theirs and not ours:
+                score -= weights[bin(theirs).count("1")]
+        return score
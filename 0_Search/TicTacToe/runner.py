@@ -1,8 +1,17 @@
 import pygame
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import tictactoe as ttt
+from mnk import MNKGame
+
+# Play an m,n,k-game instead if given: python runner.py m n k
+if len(sys.argv) == 4:
+    ttt = MNKGame(*(int(arg) for arg in sys.argv[1:]))
+elif len(sys.argv) != 1:
+    sys.exit("Usage: python runner.py [rows columns k]")
 
 pygame.init()
 size = width, height = 600, 400
@@ -15,17 +24,34 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
 user = None
 board = ttt.initial_state()
-ai_turn = False
+
+# The AI searches in a background thread so the window stays responsive;
+# ai_move is the pending search for the current board, if any, and
+# setting ai_cancel stops it
+executor = ThreadPoolExecutor(max_workers=1)
+ai_move = None
+ai_cancel = None
+
+# Fit the board into the space between the title and the buttons
+rows, columns = len(board), len(board[0])
+tile_size = min(80, 240 // rows, 560 // columns)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 while True:
 
+    # Escape resets the game, even while the AI is thinking
+    reset = False
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if ai_cancel is not None:
+                ai_cancel.set()
+            executor.shutdown(wait=False, cancel_futures=True)
             sys.exit()
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            reset = True
 
     screen.fill(black)
 
@@ -67,13 +93,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (columns / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(columns):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -108,39 +133,48 @@ while True:
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, starting a search or collecting its result
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
+            if ai_move is None:
+                ai_cancel = threading.Event()
+                ai_move = executor.submit(ttt.minimax, board, ai_cancel)
+            elif ai_move.done():
+                move = ai_move.result()
+                ai_move = None
                 board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
+            for i in range(rows):
+                for j in range(columns):
                     if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+        # Play Again once the game is over, or Reset during it
+        againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+        again = mediumFont.render("Play Again" if game_over else "Reset",
+                                  True, black)
+        againRect = again.get_rect()
+        againRect.center = againButton.center
+        pygame.draw.rect(screen, white, againButton)
+        screen.blit(again, againRect)
+        click, _, _ = pygame.mouse.get_pressed()
+        if click == 1:
+            mouse = pygame.mouse.get_pos()
+            if againButton.collidepoint(mouse):
+                time.sleep(0.2)
+                reset = True
+
+        if reset:
+            user = None
+            board = ttt.initial_state()
+
+            # Stop any search still running for the old game, so the
+            # next game's search does not wait behind it
+            if ai_move is not None:
+                ai_cancel.set()
+                ai_move = None
 
     pygame.display.flip()
@@ -4,6 +4,12 @@ Tic Tac Toe Player
 
 import math
 import copy
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import bitboard
+import book
 
 X = "X"
 O = "O"
@@ -175,67 +181,283 @@ def utility(board):
     raise NotImplementedError
 
 
-def minimax(board):
+def minimax(board, cancel=None):
     """
     Returns the optimal action for the current player on the board.
+    If cancel (a threading.Event) is set, the search stops early and
+    returns None.
     """
+    # search on the bitboard, without copying the board
+    x, o = bitboard.from_board(board)
 
     # return None if it is terminal board
-    if terminal(board) == True:
+    if bitboard.utility(x, o) is not None:
         return None
 
+    # answer from the opening book if it has the position
+    entry = book.lookup(x, o)
+    if entry is not None:
+        return bitboard.to_action(entry[1])
+
+    return best_move(x, o, transposition_table, cancel=cancel)
+
+
+def evaluate(board):
+    """
+    Returns (value, action) for a board: its minimax value (1 if X wins
+    with best play, -1 if O does, 0 for a draw) and the optimal action,
+    which is None on a terminal board.
+    """
+    x, o = bitboard.from_board(board)
+    value = bitboard.utility(x, o)
+    if value is not None:
+        return value, None
+
+    # answer from the opening book if it has the position
+    entry = book.lookup(x, o)
+    if entry is not None:
+        return entry[0], bitboard.to_action(entry[1])
+
+    return (search(x, o, -math.inf, math.inf),
+            best_move(x, o, transposition_table))
+
+
+def evaluate_chunk(boards):
+    """
+    Returns the evaluation of every board in a list.
+    """
+    return [evaluate(board) for board in boards]
+
+
+def evaluate_positions(boards, processes=None, chunksize=1024):
+    """
+    Yields (value, action) for each board in an iterable of boards, in
+    order, as evaluate does. Boards are read lazily, so any number can
+    be labeled in bounded memory.
+    If processes is more than 1, chunks of boards are evaluated in a
+    pool of worker processes, each keeping its own transposition table,
+    with only a few chunks in flight at once.
+    """
+    boards = iter(boards)
+    if not processes or processes <= 1:
+        for board in boards:
+            yield evaluate(board)
+        return
+
+    with ProcessPoolExecutor(processes) as executor:
+        pending = deque()
+        while True:
+            # Keep every worker busy, with one chunk queued behind each
+            while len(pending) < 2 * processes:
+                chunk = list(itertools.islice(boards, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(evaluate_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def minimax_with_stats(board, table=None):
+    """
+    Returns the optimal action for the current player on the board,
+    together with a SearchStats describing the search. The opening book
+    is not used, and unless a table is given the search starts from an
+    empty transposition table, so the counters reflect a full search.
+    """
+    x, o = bitboard.from_board(board)
+    stats = SearchStats()
+    if bitboard.utility(x, o) is not None:
+        return None, stats
+    if table is None:
+        table = {}
+    return best_move(x, o, table, stats), stats
+
+
+def best_move(x, o, table, stats=None, cancel=None):
+    """
+    Returns the optimal action on a non-terminal (x, o) bitboard, or
+    None if cancel is set before every move has been searched.
+    """
     # initialize a value for minimax algorithm
-    if player(board) == X:
+    x_turn = bitboard.x_to_move(x, o)
+    if x_turn:
         v = -math.inf
-    elif player(board) == O:
+    else:
         v = math.inf
 
-    # for every valid action
-    for action in actions(board):
-        # get a current score
-        current_score = getscore(result(board, action), v)
-
-        if player(board) == X:
-             current_score = max(v, current_score)
-
-        elif player(board) == O:
-             current_score = min(v, current_score)
+    # for every valid action, in order
+    ordering = MoveOrdering()
+    for move in ordered_moves(x, o, 0, ordering):
+        if cancel is not None and cancel.is_set():
+            return None
+
+        # get a current score, only needing to know if it beats v
+        if x_turn:
+            current_score = search(x | move, o, v, math.inf, 1, table, stats,
+                                   ordering)
+            current_score = max(v, current_score)
+        else:
+            current_score = search(x, o | move, -math.inf, v, 1, table, stats,
+                                   ordering)
+            current_score = min(v, current_score)
 
         if current_score != v:
             v = current_score
-            optimal_action = action
+            optimal_action = bitboard.to_action(move)
 
     return optimal_action
-    raise NotImplementedError
 
-def getscore(board, best_score):
+
+class SearchStats():
     """
-    Returns the next score.
+    Counters collected during a search.
     """
 
-    # return None if it is terminal board
-    if terminal(board) == True:
-        return utility(board)
+    def __init__(self):
+        # Positions visited, including transposition table hits
+        self.nodes = 0
 
-    # initialize a value for minimax algorithm
-    if player(board) == X:
-        v = -math.inf
-    elif player(board) == O:
-        v = math.inf
+        # Positions answered from the transposition table
+        self.table_hits = 0
+
+        # Positions whose remaining moves were pruned by alpha-beta
+        self.cutoffs = 0
+
+        # Deepest ply reached below the root
+        self.max_depth = 0
+
+    def __repr__(self):
+        return (f"SearchStats(nodes={self.nodes}, "
+                f"table_hits={self.table_hits}, cutoffs={self.cutoffs}, "
+                f"max_depth={self.max_depth})")
+
+
+# Cells in the order moves are tried: center, corners, edges
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+MOVE_RANK = tuple(MOVE_ORDER.index(cell) for cell in range(9))
 
-    # for every valid action
-    for action in actions(board):
-        score = getscore(result(board, action), v)
 
-        if player(board) == X:
-            if score > best_score:
-                return score
-            v = max(v, score)
+class MoveOrdering():
+    """
+    Killer and history tables refining the static move order. Each root
+    search starts from empty tables, so its move order (and so how much
+    it prunes) does not depend on earlier searches.
+    """
+
+    def __init__(self):
+        # The last move to cause a cutoff at each ply
+        self.killers = [0] * 10
+
+        # How many cutoffs each cell has caused
+        self.history = [0] * 9
 
-        elif player(board) == O:
-            if score < best_score:
-                return score
-            v = min(v, score)
 
+def ordered_moves(x, o, ply, ordering):
+    """
+    Returns the moves on an (x, o) bitboard as single-bit masks, killer
+    move first, then by history score and center/corner/edge order.
+    """
+    history = ordering.history
+    moves = sorted(bitboard.moves(x, o),
+                   key=lambda move: (-history[move.bit_length() - 1],
+                                     MOVE_RANK[move.bit_length() - 1]))
+    killer = ordering.killers[ply]
+    if killer in moves and moves[0] != killer:
+        moves.remove(killer)
+        moves.insert(0, killer)
+    return moves
+
+
+def record_cutoff(move, ply, ordering, stats):
+    """
+    Records that move caused a cutoff at ply.
+    """
+    ordering.killers[ply] = move
+    ordering.history[move.bit_length() - 1] += 1
+    if stats is not None:
+        stats.cutoffs += 1
+
+
+# Bounds stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Maps (x, o) bitboards to (flag, value) pairs from earlier searches.
+# Positions do not depend on how they were reached, so the table is
+# shared by every search (and every game) in the process.
+transposition_table = {}
+
+
+def getscore(board, alpha=-math.inf, beta=math.inf):
+    """
+    Returns the minimax score of the board, using alpha-beta pruning.
+    If the score is at most alpha or at least beta, only a bound on it
+    beyond that side of the window is returned.
+    """
+    x, o = bitboard.from_board(board)
+    return search(x, o, alpha, beta)
+
+
+def search(x, o, alpha, beta, ply=0, table=transposition_table, stats=None,
+           ordering=None):
+    """
+    Returns the minimax score of the (x, o) bitboard, as getscore does,
+    where ply is the depth below the root of the search. Counters are
+    added to stats if given. The move ordering tables of the search are
+    passed down in ordering, which is created at the root if not given.
+    """
+    if ordering is None:
+        ordering = MoveOrdering()
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, ply)
+
+    # look the board up in the transposition table
+    key = (x, o)
+    entry = table.get(key)
+    if entry is not None:
+        flag, value = entry
+        if (flag == EXACT or (flag == LOWER and value >= beta)
+                or (flag == UPPER and value <= alpha)):
+            if stats is not None:
+                stats.table_hits += 1
+            return value
+
+    # return the utility if it is terminal board
+    v = bitboard.utility(x, o)
+    if v is not None:
+        table[key] = (EXACT, v)
+        return v
+
+    # for every valid action, narrowing the window as scores come in
+    if bitboard.x_to_move(x, o):
+        v = -math.inf
+        low = alpha
+        for move in ordered_moves(x, o, ply, ordering):
+            v = max(v, search(x | move, o, low, beta, ply + 1, table, stats,
+                              ordering))
+            low = max(low, v)
+            if low >= beta:
+                record_cutoff(move, ply, ordering, stats)
+                break
+    else:
+        v = math.inf
+        high = beta
+        for move in ordered_moves(x, o, ply, ordering):
+            v = min(v, search(x, o | move, alpha, high, ply + 1, table, stats,
+                              ordering))
+            high = min(high, v)
+            if alpha >= high:
+                record_cutoff(move, ply, ordering, stats)
+                break
+
+    # store whether the score is exact or only a bound
+    if v <= alpha:
+        table[key] = (UPPER, v)
+    elif v >= beta:
+        table[key] = (LOWER, v)
+    else:
+        table[key] = (EXACT, v)
     return v
-    raise NotImplementedError
\ No newline at end of file
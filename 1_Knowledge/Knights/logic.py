@@ -1,19 +1,87 @@
 import itertools
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 
 class Sentence():
+    """Sentences are immutable and hash-consed: constructing a sentence
+    structurally equal to one that already exists returns the existing
+    object, so equality is identity and hashes and symbol sets are
+    computed once per node."""
+
+    __slots__ = ("_hash", "_symbols", "__weakref__")
+
+    # Every sentence in use, keyed by its class and constructor arguments
+    _interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def _node(cls, fields, operands, symbols=None):
+        """Returns the sentence of class cls with these field values,
+        creating it if needed from its operand sentences."""
+        for operand in operands:
+            Sentence.validate(operand)
+        key = (cls,) + fields
+        node = Sentence._interned.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for slot, value in zip(cls.__slots__, fields):
+                object.__setattr__(node, slot, value)
+            if symbols is None:
+                symbols = frozenset().union(
+                    *[operand._symbols for operand in operands]
+                )
+            object.__setattr__(node, "_hash", hash(key))
+            object.__setattr__(node, "_symbols", symbols)
+            Sentence._interned[key] = node
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __hash__(self):
+        return self._hash
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """Evaluates the sentence in a model that may leave symbols out:
+        returns True or False if every completion of the model agrees,
+        or None if the value depends on the missing symbols."""
+        raise Exception("nothing to evaluate")
+
+    def operands(self):
+        """Returns the sentences the sentence is built from."""
+        return ()
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return self._symbols
+
+    def compile(self, compiler):
+        """Returns a Python expression evaluating the sentence in the model
+        encoded by integer m, where bit compiler.index[name] holds symbol
+        name. Operands are compiled with compiler.operand."""
+        raise Exception("nothing to compile")
+
+    def cnf_literal(self, cnf):
+        """Adds clauses defining the sentence to a CNF (Tseitin encoding)
+        and returns the literal that is true exactly when it holds."""
+        raise Exception("nothing to encode")
+
+    def evaluate_bits(self, columns, mask):
+        """Evaluates the sentence in many models at once. Bit k of
+        columns[name] holds symbol name in model k, and mask has a bit set
+        for every model; returns the bits of the models where the sentence
+        is true."""
+        raise Exception("nothing to evaluate")
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +111,13 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
+    def __new__(cls, name):
+        return cls._node((name,), (), frozenset((name,)))
 
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __repr__(self):
         return self.name
@@ -62,23 +128,33 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        return model.get(self.name)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def compile(self, compiler):
+        return f"(m >> {compiler.index[self.name]} & 1)"
+
+    def cnf_literal(self, cnf):
+        return cnf.variable(self.name)
+
+    def evaluate_bits(self, columns, mask):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    __slots__ = ("operand",)
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+    def __new__(cls, operand):
+        return cls._node((operand,), (operand,))
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +162,34 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
+    def operands(self):
+        return (self.operand,)
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def compile(self, compiler):
+        return f"(not {compiler.operand(self.operand)})"
+
+    def evaluate_bits(self, columns, mask):
+        return mask ^ self.operand.evaluate_bits(columns, mask)
+
+    def cnf_literal(self, cnf):
+        return -self.operand.cnf_literal(cnf)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+    __slots__ = ("conjuncts",)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+    def __new__(cls, *conjuncts):
+        return cls._node((conjuncts,), conjuncts)
 
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def __reduce__(self):
+        return (And, self.conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +198,61 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError("sentences are immutable: "
+                        "use And(*knowledge.conjuncts, conjunct)")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
+    def operands(self):
+        return self.conjuncts
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def compile(self, compiler):
+        # Compile operands in a loop rather than a generator, so that
+        # deeply nested sentences use fewer stack frames
+        codes = []
+        for conjunct in flatten(self.conjuncts, And):
+            codes.append(compiler.operand(conjunct))
+        if not codes:
+            return "True"
+        return "(" + " and ".join(codes) + ")"
+
+    def evaluate_bits(self, columns, mask):
+        bits = mask
+        for conjunct in self.conjuncts:
+            bits &= conjunct.evaluate_bits(columns, mask)
+        return bits
+
+    def cnf_literal(self, cnf):
+        return cnf.define_and(
+            [conjunct.cnf_literal(cnf) for conjunct in self.conjuncts]
+        )
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+    __slots__ = ("disjuncts",)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+    def __new__(cls, *disjuncts):
+        return cls._node((disjuncts,), disjuncts)
 
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +261,53 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
+    def operands(self):
+        return self.disjuncts
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def compile(self, compiler):
+        codes = []
+        for disjunct in flatten(self.disjuncts, Or):
+            codes.append(compiler.operand(disjunct))
+        if not codes:
+            return "False"
+        return "(" + " or ".join(codes) + ")"
+
+    def evaluate_bits(self, columns, mask):
+        bits = 0
+        for disjunct in self.disjuncts:
+            bits |= disjunct.evaluate_bits(columns, mask)
+        return bits
+
+    def cnf_literal(self, cnf):
+        return -cnf.define_and(
+            [-disjunct.cnf_literal(cnf) for disjunct in self.disjuncts]
+        )
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
-        Sentence.validate(antecedent)
-        Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+    __slots__ = ("antecedent", "consequent")
 
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+    def __new__(cls, antecedent, consequent):
+        return cls._node((antecedent, consequent), (antecedent, consequent))
 
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +316,49 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
+    def operands(self):
+        return (self.antecedent, self.consequent)
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def compile(self, compiler):
+        antecedent = compiler.operand(self.antecedent)
+        consequent = compiler.operand(self.consequent)
+        return f"(not {antecedent} or {consequent})"
+
+    def evaluate_bits(self, columns, mask):
+        antecedent = self.antecedent.evaluate_bits(columns, mask)
+        consequent = self.consequent.evaluate_bits(columns, mask)
+        return (mask ^ antecedent) | consequent
+
+    def cnf_literal(self, cnf):
+        antecedent = self.antecedent.cnf_literal(cnf)
+        consequent = self.consequent.cnf_literal(cnf)
+        return -cnf.define_and([antecedent, -consequent])
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
-        Sentence.validate(left)
-        Sentence.validate(right)
-        self.left = left
-        self.right = right
+    __slots__ = ("left", "right")
 
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+    def __new__(cls, left, right):
+        return cls._node((left, right), (left, right))
 
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +369,630 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
+    def operands(self):
+        return (self.left, self.right)
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
+    def compile(self, compiler):
+        left = compiler.operand(self.left)
+        right = compiler.operand(self.right)
+        return f"(bool({left}) == bool({right}))"
+
+    def evaluate_bits(self, columns, mask):
+        left = self.left.evaluate_bits(columns, mask)
+        right = self.right.evaluate_bits(columns, mask)
+        return mask ^ (left ^ right)
+
+    def cnf_literal(self, cnf):
+        left = self.left.cnf_literal(cnf)
+        right = self.right.cnf_literal(cnf)
+        return cnf.define_equal(left, right)
+
+
+def flatten(sentences, cls):
+    """Returns sentences with any nested sentences of class cls (And or Or)
+    replaced by their operands, in order."""
+    flat = []
+    stack = list(reversed(sentences))
+    while stack:
+        sentence = stack.pop()
+        if type(sentence) is cls:
+            stack.extend(reversed(sentence.operands()))
+        else:
+            flat.append(sentence)
+    return flat
+
+
+# Deepest nesting of operands compiled into one expression; Python's
+# parser rejects expressions nested much more deeply
+MAX_NESTING = 50
+
+
+class Compiler():
+    """Compiles sentences into Python expressions over an integer model m.
+    Operands nested too deeply for one expression are compiled into
+    functions of their own, which the expression calls by name."""
+
+    def __init__(self, index):
+        self.index = index
+
+        # Functions of compiled operands by name, used as the globals of
+        # the compiled expressions
+        self.functions = {}
+
+        # Nesting depth of the deepest operand compiled so far at the
+        # current level
+        self.depth = 0
+
+    def operand(self, sentence):
+        """Returns an expression evaluating a sentence."""
+        outer = self.depth
+        self.depth = 0
+        code = sentence.compile(self)
+        depth = self.depth + 1
+        if depth >= MAX_NESTING:
+            name = f"operand{len(self.functions)}"
+            self.functions[name] = self.function(code)
+            code = f"{name}(m)"
+            depth = 1
+        self.depth = max(outer, depth)
+        return code
+
+    def function(self, code):
+        """Returns a function of m evaluating an expression."""
+        return eval(f"lambda m: {code}", self.functions)
+
+
+def compile_sentence(sentence, index):
+    """Compiles a sentence into a function of an integer model m, where
+    bit index[name] of m holds the truth value of symbol name."""
+    compiler = Compiler(index)
+    return compiler.function(compiler.operand(sentence))
+
+
+def model_check(knowledge, query, stats=None):
+    """Checks if knowledge base entails query, assigning symbols one at a
+    time and abandoning a partial model as soon as knowledge is false or
+    query is true in it. If a stats dictionary is given, the number of
+    partial models visited is stored in it."""
+
+    # Assign the most frequently occurring symbols first, since they
+    # decide the most subformulas
+    counts = symbol_counts(knowledge)
+    counts.update(symbol_counts(query))
+    symbols = sorted(counts, key=lambda symbol: (-counts[symbol], symbol))
+    visited = 0
+
+    def check_all(model, i):
+        """Checks that no completion of model is a counterexample."""
+        nonlocal visited
+        visited += 1
+
+        # No counterexample where knowledge is false or query is true
+        holds = knowledge.evaluate_partial(model)
+        if holds is False:
+            return True
+        answer = query.evaluate_partial(model)
+        if answer is True:
+            return True
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
+        # Every completion is a counterexample if knowledge is true and
+        # query is false
+        if holds is True and answer is False:
+            return False
+
+        # Otherwise, check both values of the next symbol
+        symbol = symbols[i]
+        model[symbol] = True
+        result = check_all(model, i + 1)
+        if result:
+            model[symbol] = False
+            result = check_all(model, i + 1)
+        del model[symbol]
+        return result
+
+    result = check_all({}, 0)
+    if stats is not None:
+        stats["visited"] = visited
+    return result
+
+
+def symbol_counts(sentence):
+    """Returns a dictionary of the number of occurrences of each symbol."""
+    counts = {}
+    stack = [sentence]
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, Symbol):
+            counts[sentence.name] = counts.get(sentence.name, 0) + 1
+        stack.extend(sentence.operands())
+    return counts
+
+
+def model_check_compiled(knowledge, query):
+    """Checks if knowledge base entails query by testing every model with
+    the sentences compiled into one function."""
+
+    # Get all symbols in both knowledge and query, numbered by bit position
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    # Compile a test for a model where knowledge holds but query does not
+    counterexample = compile_sentence(And(knowledge, Not(query)), index)
+
+    # Knowledge entails query if no model is a counterexample
+    return not any(map(counterexample, range(2 ** len(symbols))))
+
+
+# Number of models a worker tests between checks for an early stop
+SHARD_CHUNK = 2 ** 16
+
+# Set in each worker process by start_worker
+worker_test = None
+worker_stop = None
+
+
+def start_worker(knowledge, query, symbols, stop):
+    """Compiles the counterexample test once per worker process."""
+    global worker_test, worker_stop
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    worker_test = compile_sentence(And(knowledge, Not(query)), index)
+    worker_stop = stop
+
+
+def check_shard(start, stop):
+    """Returns True if some model numbered from start up to stop is a
+    counterexample, giving up once another worker has found one."""
+    for chunk in range(start, stop, SHARD_CHUNK):
+        if worker_stop.is_set():
+            return False
+        if any(map(worker_test, range(chunk, min(chunk + SHARD_CHUNK, stop)))):
+            worker_stop.set()
             return True
+    return False
+
+
+def model_check_parallel(knowledge, query, processes=None, shard_bits=None):
+    """Checks if knowledge base entails query, splitting the models into
+    2 ** shard_bits shards by the values of the highest-numbered symbols
+    and testing the shards in a pool of processes, which all stop as soon
+    as one finds a counterexample."""
+
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    processes = processes or os.cpu_count() or 1
+
+    # By default, make a few shards per process to even out the load
+    if shard_bits is None:
+        shard_bits = (4 * processes - 1).bit_length()
+    shard_bits = min(shard_bits, len(symbols))
+    size = 2 ** (len(symbols) - shard_bits)
+
+    stop = multiprocessing.Event()
+    with ProcessPoolExecutor(
+        processes, initializer=start_worker,
+        initargs=(knowledge, query, symbols, stop)
+    ) as executor:
+        pending = {
+            executor.submit(check_shard, shard * size, (shard + 1) * size)
+            for shard in range(2 ** shard_bits)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(future.result() for future in done):
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                return False
+    return True
+
+
+def model_check_vectorized(knowledge, query, chunk_bits=20):
+    """Checks if knowledge base entails query, evaluating each sentence
+    once per chunk of 2 ** chunk_bits models, with every model held in one
+    bit of an integer column per symbol."""
+
+    symbols = sorted(knowledge.symbols() | query.symbols())
+
+    # The first symbols vary within a chunk, the rest between chunks
+    inner, outer = symbols[:chunk_bits], symbols[chunk_bits:]
+    size = 2 ** len(inner)
+    mask = (1 << size) - 1
+
+    # Column for inner symbol i: runs of 2 ** i false then 2 ** i true,
+    # repeated by doubling until the column covers every model
+    columns = {}
+    for i, symbol in enumerate(inner):
+        run = 2 ** i
+        column = ((1 << run) - 1) << run
+        width = 2 * run
+        while width < size:
+            column |= column << width
+            width *= 2
+        columns[symbol] = column
+
+    for chunk in range(2 ** len(outer)):
+        for i, symbol in enumerate(outer):
+            columns[symbol] = mask if chunk >> i & 1 else 0
+
+        # Look for a model where knowledge holds but query does not
+        if (knowledge.evaluate_bits(columns, mask)
+                & ~query.evaluate_bits(columns, mask)):
+            return False
+    return True
+
+
+class KnowledgeBase():
+    """A conjunction of sentences, with the models satisfying it enumerated
+    once and kept, so that each entailment query only checks the kept
+    models. Models are integers where bit index[name] holds symbol name."""
+
+    def __init__(self, *sentences):
+        self.sentences = []
+        self.symbols = []
+        self.index = {}
+
+        # Models in which every sentence holds
+        self.models = [0]
+
+        # Answers to queries since the last sentence was added
+        self.answers = {}
+
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """Adds a sentence, keeping only the models in which it holds."""
+        Sentence.validate(sentence)
+        self.sentences.append(sentence)
+        self.answers.clear()
+        models = self.add_symbols(sentence.symbols())
+        test = compile_sentence(sentence, self.index)
+        self.models = list(filter(test, models))
+
+    def add_symbols(self, symbols):
+        """Numbers any new symbols after the known ones, and returns the
+        models extended with every assignment of the new symbols."""
+        new = sorted(symbols - self.index.keys())
+        for symbol in new:
+            self.index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        if not new:
+            return self.models
+        shift = len(self.symbols) - len(new)
+        return [model | assignment << shift
+                for assignment in range(2 ** len(new))
+                for model in self.models]
+
+    def knowledge(self):
+        """Returns the conjunction of the sentences added."""
+        return And(*self.sentences)
+
+    def satisfiable(self):
+        return bool(self.models)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        if query not in self.answers:
+            test = compile_sentence(query, self.index_for(query))
+            models = self.models
+            if not query.symbols() <= self.index.keys():
+                models = self.models_with(query.symbols())
+            self.answers[query] = all(map(test, models))
+        return self.answers[query]
+
+    def index_for(self, query):
+        """Returns the symbol index extended with any symbols of query
+        that no sentence mentions."""
+        index = dict(self.index)
+        for symbol in sorted(query.symbols() - self.index.keys()):
+            index[symbol] = len(index)
+        return index
+
+    def models_with(self, symbols):
+        """Returns the models extended with every assignment of the
+        symbols that no sentence mentions, numbered as by index_for."""
+        count = len(symbols - self.index.keys())
+        shift = len(self.symbols)
+        return [model | assignment << shift
+                for assignment in range(2 ** count)
+                for model in self.models]
+
+
+class CNF():
+    """Conjunctive normal form over integer variables: each clause is a
+    list of nonzero literals, where -v is the negation of variable v.
+    Symbols get their own variables, and every other subformula is named
+    by a fresh variable (Tseitin encoding), so the size of the CNF stays
+    linear in the size of the sentences added."""
+
+    def __init__(self):
+        self.clauses = []
+        self.variables = {}
+        self.count = 0
+
+        # Maps definitions already encoded to the literal naming them
+        self.definitions = {}
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """Returns the variable for a symbol name."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+        return self.variables[name]
+
+    def define_and(self, literals):
+        """Returns a literal equivalent to the conjunction of literals."""
+        if len(literals) == 1:
+            return literals[0]
+        key = ("and", tuple(sorted(literals)))
+        if key not in self.definitions:
+            v = self.new_variable()
+            for literal in literals:
+                self.clauses.append([-v, literal])
+            self.clauses.append([v] + [-literal for literal in literals])
+            self.definitions[key] = v
+        return self.definitions[key]
+
+    def define_equal(self, left, right):
+        """Returns a literal true exactly when two literals are equal."""
+        key = ("equal", min(left, right), max(left, right))
+        if key not in self.definitions:
+            v = self.new_variable()
+            self.clauses.append([-v, -left, right])
+            self.clauses.append([-v, left, -right])
+            self.clauses.append([v, left, right])
+            self.clauses.append([v, -left, -right])
+            self.definitions[key] = v
+        return self.definitions[key]
+
+    def add(self, sentence):
+        """Adds clauses asserting that a sentence is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append([disjunct.cnf_literal(self)
+                                 for disjunct in sentence.disjuncts])
         else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+            self.clauses.append([sentence.cnf_literal(self)])
+
+
+def to_cnf(sentence):
+    """Returns a CNF that is satisfiable exactly when the sentence is."""
+    cnf = CNF()
+    cnf.add(sentence)
+    return cnf
+
+
+class SATSolver():
+    """CDCL SAT solver: unit propagation with two watched literals per
+    clause, first-UIP clause learning with non-chronological backjumping,
+    and activity-based decisions with saved phases."""
+
+    def __init__(self, count, clauses):
+        self.count = count
+
+        # Value of each variable: 1 true, -1 false, 0 unassigned
+        self.values = [0] * (count + 1)
+        self.levels = [0] * (count + 1)
+        self.reasons = [None] * (count + 1)
+        self.phases = [-1] * (count + 1)
+        self.activity = [0.0] * (count + 1)
+        self.increment = 1.0
+
+        # Assigned literals in order, and where each decision level starts
+        self.trail = []
+        self.trail_starts = []
+        self.propagated = 0
+
+        # Clauses watching each literal, indexed by literal + count
+        self.watches = [[] for _ in range(2 * count + 1)]
+
+        self.unsatisfiable = False
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def value(self, literal):
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, clause):
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            return
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            if self.value(clause[0]) == -1:
+                self.unsatisfiable = True
+            elif self.value(clause[0]) == 0:
+                self.assign(clause[0], None)
+        else:
+            self.watches[clause[0] + self.count].append(clause)
+            self.watches[clause[1] + self.count].append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_starts)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Assigns every literal implied by unit clauses. Returns a
+        conflicting clause, or None."""
+        while self.propagated < len(self.trail):
+            false_literal = -self.trail[self.propagated]
+            self.propagated += 1
+            watching = self.watches[false_literal + self.count]
+            self.watches[false_literal + self.count] = kept = []
+            for i, clause in enumerate(watching):
+                # Keep the false watched literal in position 1
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) == 1:
+                    kept.append(clause)
+                    continue
+
+                # Watch another literal that is not false, if there is one
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches[clause[1] + self.count].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(clause[0]) == -1:
+                        kept.extend(watching[i + 1:])
+                        return clause
+                    self.assign(clause[0], clause)
+        return None
+
+    def analyze(self, conflict):
+        """Returns a learned clause asserting its first literal, and the
+        decision level to jump back to."""
+        level = len(self.trail_starts)
+        seen = set()
+        learned = [None]
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+
+            # Resolve on the most recent seen literal of this level
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learned[0] = -literal
+
+        # Jump back to the highest level among the other literals,
+        # watching a literal from that level
+        backjump = 0
+        for i in range(1, len(learned)):
+            if self.levels[abs(learned[i])] > backjump:
+                backjump = self.levels[abs(learned[i])]
+                learned[1], learned[i] = learned[i], learned[1]
+        return learned, backjump
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+
+    def backtrack(self, level):
+        if len(self.trail_starts) <= level:
+            return
+        start = self.trail_starts[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = self.values[variable]
+            self.values[variable] = 0
+            self.reasons[variable] = None
+        del self.trail[start:]
+        del self.trail_starts[level:]
+        self.propagated = start
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity,
+        or None if every variable is assigned."""
+        best = None
+        for variable in range(1, self.count + 1):
+            if self.values[variable] == 0 and (
+                best is None or self.activity[variable] > self.activity[best]
+            ):
+                best = variable
+        return best
+
+    def solve(self):
+        """Returns a satisfying assignment as a list of values indexed by
+        variable, or None if the clauses are unsatisfiable."""
+        if self.unsatisfiable:
+            return None
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.trail_starts:
+                    return None
+                learned, backjump = self.analyze(conflict)
+                self.backtrack(backjump)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.watches[learned[0] + self.count].append(learned)
+                    self.watches[learned[1] + self.count].append(learned)
+                    self.assign(learned[0], learned)
+                self.increment /= 0.95
+            else:
+                variable = self.decide()
+                if variable is None:
+                    return list(self.values)
+                self.trail_starts.append(len(self.trail))
+                self.assign(variable * self.phases[variable], None)
+
+
+def satisfiable(sentence):
+    """Returns a model (a dict from symbol names to truth values) in which
+    the sentence is true, or None if there is none."""
+    cnf = to_cnf(sentence)
+    values = SATSolver(cnf.count, cnf.clauses).solve()
+    if values is None:
+        return None
+    return {name: values[variable] == 1
+            for name, variable in cnf.variables.items()}
+
+
+def sat_check(knowledge, query):
+    """Checks if knowledge base entails query, by checking that knowledge
+    together with the negation of query is unsatisfiable."""
+    return satisfiable(And(knowledge, Not(query))) is None
+
+
+# Entailment procedures that can be selected by name
+ENGINES = {
+    "model_check": model_check,
+    "compiled": model_check_compiled,
+    "parallel": model_check_parallel,
+    "vectorized": model_check_vectorized,
+    "sat": sat_check,
+}
+
+
+def entails(knowledge, query, engine="model_check"):
+    """Checks if knowledge base entails query with the named engine."""
+    try:
+        check = ENGINES[engine]
+    except KeyError:
+        raise Exception(f"unknown engine {engine}")
+    return check(knowledge, query)
@@ -108,8 +108,10 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            # Enumerate the models once, then check each symbol against them
+            knowledge_base = KnowledgeBase(*knowledge.conjuncts)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if knowledge_base.entails(symbol):
                     print(f"    {symbol}")
 
 
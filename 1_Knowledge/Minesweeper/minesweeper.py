@@ -1,5 +1,6 @@
 import itertools
 import random
+from collections import deque
 
 
 class Minesweeper():
@@ -165,8 +166,25 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by key
+        self.sentences = {}
+        self.next_key = 0
+
+        # Map each cell to the keys of the sentences containing it
+        self.index = {}
+
+        # (cells, count) of every sentence, to skip duplicates
+        self.signatures = set()
+
+        # Keys of sentences added or changed since last examined
+        self.pending = deque()
+
+    @property
+    def knowledge(self):
+        """
+        List of sentences about the game known to be true.
+        """
+        return list(self.sentences.values())
 
     def mark_mine(self, cell):
         """
@@ -174,8 +192,11 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        for key in self.index.pop(cell, ()):
+            sentence = self.sentences[key]
+            self.signatures.discard(signature(sentence))
             sentence.mark_mine(cell)
+            self.changed(key)
 
     def mark_safe(self, cell):
         """
@@ -183,8 +204,44 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        for key in self.index.pop(cell, ()):
+            sentence = self.sentences[key]
+            self.signatures.discard(signature(sentence))
             sentence.mark_safe(cell)
+            self.changed(key)
+
+    def add_sentence(self, cells, count):
+        """
+        Adds a sentence about cells, leaving out cells known to be safe
+        or mines, unless it is empty or already known.
+        """
+        cells = set(cells) - self.safes
+        mines = cells & self.mines
+        cells -= mines
+        sentence = Sentence(cells, count - len(mines))
+        if not cells or signature(sentence) in self.signatures:
+            return
+        key = self.next_key
+        self.next_key += 1
+        self.sentences[key] = sentence
+        self.signatures.add(signature(sentence))
+        for cell in cells:
+            self.index.setdefault(cell, set()).add(key)
+        self.pending.append(key)
+
+    def changed(self, key):
+        """
+        Drops a sentence that became empty or a duplicate after a cell
+        was removed from it, or queues it to be examined again.
+        """
+        sentence = self.sentences[key]
+        if sentence.cells and signature(sentence) not in self.signatures:
+            self.signatures.add(signature(sentence))
+            self.pending.append(key)
+            return
+        del self.sentences[key]
+        for cell in sentence.cells:
+            self.index[cell].discard(key)
 
     def add_knowledge(self, cell, count):
         """
@@ -224,20 +281,9 @@ class MinesweeperAI():
                     neighbors.add((i, j))
 
         # add neighbors and count to sentence and then to knowledge
-        new_sentence = Sentence(neighbors, count)
-        self.knowledge.append(new_sentence)
+        self.add_sentence(neighbors, count)
 
-        self.update_sentences()
-
-        inferences = self.new_inferences()
-
-        while inferences:
-            for sentence in inferences:
-                self.knowledge.append(sentence)
-
-            self.update_sentences()
-
-            inferences = self.new_inferences()
+        self.infer()
 
     def make_safe_move(self):
         """
@@ -269,43 +315,46 @@ class MinesweeperAI():
         else:
             return None
 
-    def new_inferences(self):
-        inferences = []
-        removals = []
-        for sentence1 in self.knowledge:
-            if sentence1.cells == set():
-                removals.append(sentence1)
+    def infer(self):
+        """
+        Examines queued sentences until none are left, marking the cells
+        of sentences that decide all their cells, and comparing the rest
+        with the sentences they overlap, where one's cells are a subset
+        of the other's, to add the difference as a new sentence.
+        """
+        while self.pending:
+            key = self.pending.popleft()
+            sentence = self.sentences.get(key)
+            if sentence is None:
                 continue
 
-            for sentence2 in self.knowledge:
-                if sentence2.cells == set():
-                    removals.append(sentence2)
-
-                if sentence1 != sentence2:
-
-                    # draw new inference from existing knowledge use subset method
-                    if sentence2.cells.issubset(sentence1.cells):
-                        diff_cells = sentence1.cells.difference(sentence2.cells)
-                        diff_count = sentence1.count - sentence2.count
-                        new_inference = Sentence(diff_cells, diff_count)
-                        if new_inference not in self.knowledge:
-                            inferences.append(new_inference)
-
-        self.knowledge = [x for x in self.knowledge if x not in removals]
-        return inferences
-
-    def update_sentences(self):
-        counter = 1
-        while counter:
-            counter = 0
-            for sentence in self.knowledge:
-                for cell in sentence.known_safes():
+            # Every cell is safe, or every cell is a mine
+            if sentence.count == 0:
+                for cell in list(sentence.cells):
                     self.mark_safe(cell)
-                    counter += 1
-                for cell in sentence.known_mines():
+                continue
+            if sentence.count == len(sentence.cells):
+                for cell in list(sentence.cells):
                     self.mark_mine(cell)
-                    counter += 1
-            for cell in self.safes:
-                self.mark_safe(cell)
-            for cell in self.mines:
-                self.mark_mine(cell)
+                continue
+
+            # Only sentences sharing a cell can be subsets of each other
+            overlapping = set()
+            for cell in sentence.cells:
+                overlapping.update(self.index[cell])
+            overlapping.discard(key)
+            for other_key in overlapping:
+                other = self.sentences[other_key]
+                if other.cells < sentence.cells:
+                    self.add_sentence(sentence.cells - other.cells,
+                                      sentence.count - other.count)
+                elif sentence.cells < other.cells:
+                    self.add_sentence(other.cells - sentence.cells,
+                                      other.count - sentence.count)
+
+
+def signature(sentence):
+    """
+    Returns a hashable (cells, count) pair for a sentence.
+    """
+    return frozenset(sentence.cells), sentence.count